@@ -0,0 +1,92 @@
+import base64
+import json
+import logging
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver import FirefoxOptions
+
+from linkage_checker.constants import (
+    BROWSER_BLOCKED_URL_PATTERNS,
+    BROWSER_CONSENT_COOKIES,
+    BROWSER_COOKIE_SEED_URL,
+    BROWSER_PAGE_LOAD_STRATEGY,
+)
+
+# blocked resources are sent to this (closed) proxy so they fail immediately
+BLACKHOLE_PROXY = "PROXY 127.0.0.1:9"
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserProfile:
+    """Settings of the Firefox sessions that run the linkage checker.
+
+    The defaults give a lean session: headless, no images, no web fonts or
+    analytics, only waiting for the DOM to be ready (pageLoadStrategy eager)
+    and with the cookie consent given up front so the banner is not shown.
+    """
+
+    def __init__(
+        self,
+        headless=True,
+        page_load_strategy=BROWSER_PAGE_LOAD_STRATEGY,
+        blocked_url_patterns=BROWSER_BLOCKED_URL_PATTERNS,
+        load_images=False,
+        consent_cookies=BROWSER_CONSENT_COOKIES,
+    ):
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.blocked_url_patterns = tuple(blocked_url_patterns)
+        self.load_images = load_images
+        self.consent_cookies = tuple(consent_cookies)
+
+    def desired_capabilities(self):
+        options = FirefoxOptions()
+        options.headless = self.headless
+        if not self.load_images:
+            options.set_preference("permissions.default.image", 2)
+        # use the fonts of the browser instead of downloading web fonts
+        options.set_preference("browser.display.use_document_fonts", 0)
+        # keep the memory footprint of a session small
+        options.set_preference("dom.ipc.processCount", 1)
+        options.set_preference("browser.sessionhistory.max_total_viewers", 0)
+        options.set_preference("browser.cache.disk.enable", False)
+        if self.blocked_url_patterns:
+            # a proxy auto-config script is the only way to block urls by
+            # pattern in firefox without an extension. include_path makes the
+            # full url (not only the host) of https requests available to it.
+            options.set_preference("network.proxy.type", 2)
+            options.set_preference(
+                "network.proxy.autoconfig_url", self.__proxy_auto_config_url()
+            )
+            options.set_preference("network.proxy.autoconfig_url.include_path", True)
+
+        capabilities = options.to_capabilities()
+        capabilities["pageLoadStrategy"] = self.page_load_strategy
+        return capabilities
+
+    def seed_cookies(self, browser):
+        """Sets the consent cookies, browser is left on BROWSER_COOKIE_SEED_URL."""
+        if not self.consent_cookies:
+            return
+        try:
+            browser.get(BROWSER_COOKIE_SEED_URL)
+            for cookie in self.consent_cookies:
+                browser.add_cookie(dict(cookie))
+        except WebDriverException:
+            # not fatal, the cookie consent banner is handled on the page itself
+            logger.debug("seeding cookies failed", exc_info=True)
+
+    def __proxy_auto_config_url(self):
+        conditions = " || ".join(
+            "shExpMatch(url, {})".format(json.dumps(pattern))
+            for pattern in self.blocked_url_patterns
+        )
+        script = (
+            "function FindProxyForURL(url, host) {{"
+            " if ({}) {{ return {}; }}"
+            ' return "DIRECT"; }}'
+        ).format(conditions, json.dumps(BLACKHOLE_PROXY))
+        return "data:application/x-ns-proxy-autoconfig;base64," + base64.b64encode(
+            script.encode("utf-8")
+        ).decode("ascii")
@@ -7,17 +7,23 @@ import click
 import click_log
 
 # Setup logging before package imports.
-from linkage_checker.constants import REMOTE_WEBDRIVER_CONNECTION_URL
+from linkage_checker.constants import (
+    BROWSER_BLOCKED_URL_PATTERNS,
+    BROWSER_PAGE_LOAD_STRATEGY,
+    REMOTE_WEBDRIVER_CONNECTION_URL,
+    RESULT_STORE_RETENTION_DAYS,
+)
 
 logger = logging.getLogger(__name__)
 click_log.basic_config(logger)
 
-from linkage_checker.core import main
 from linkage_checker.error import AppError
 
 
 def set_log_level():
     loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
+    # modules that are imported lazily inherit the level of the package logger
+    loggers.append(logging.getLogger("linkage_checker"))
     for logger_ in loggers:
         logger_.setLevel(logger.level)
     logging.info("Set loglevels to %s.", logging.getLevelName(logger.level))
@@ -46,8 +52,10 @@ def cli():
 @click.option(
     "--remote-selenium-url",
     required=False,
-    default=REMOTE_WEBDRIVER_CONNECTION_URL,
-    help="Connection URL of the selenium (remote) webdriver.",
+    multiple=True,
+    type=click.STRING,
+    default=(REMOTE_WEBDRIVER_CONNECTION_URL,),
+    help="Connection URL of the selenium (remote) webdriver or grid. Can be repeated to spread the browser sessions over several grids.",
 )
 @click.option(
     "--enable-caching",
@@ -55,6 +63,19 @@ def cli():
     default=False,
     help="Cache the NGR records in a local json file (useful for debugging purposes).",
 )
+@click.option(
+    "--cache-dir",
+    required=False,
+    default=None,
+    help="Directory for an http cache of the NGR responses, unchanged records are revalidated instead of downloaded again.",
+    type=click.types.Path(
+        exists=False,
+        file_okay=False,
+        dir_okay=True,
+        writable=True,
+        allow_dash=False,
+    ),
+)
 @click.option(
     "--browser-screenshots",
     is_flag=True,
@@ -74,10 +95,125 @@ def cli():
     multiple=True,
     help="Specify uuid of datasets to validate."
 )
+@click.option(
+    "--profile",
+    "profile_path",
+    required=False,
+    default=None,
+    help="Write cProfile statistics of the harvest and check phases to PROFILE_PATH.harvest.pstats and PROFILE_PATH.check.pstats.",
+    type=click.types.Path(
+        exists=False,
+        file_okay=True,
+        dir_okay=False,
+        writable=True,
+        allow_dash=False,
+    ),
+)
+@click.option(
+    "--workers",
+    required=False,
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of datasets that are checked at the same time, checks start while the NGR is still being harvested. 0 uses the number of slots of the selenium grids.",
+)
+@click.option(
+    "--headless/--no-headless",
+    default=True,
+    show_default=True,
+    help="Run the browser without a display.",
+)
+@click.option(
+    "--page-load-strategy",
+    default=BROWSER_PAGE_LOAD_STRATEGY,
+    show_default=True,
+    type=click.Choice(["normal", "eager", "none"]),
+    help="When the browser considers a page loaded, eager only waits for the DOM to be ready.",
+)
+@click.option(
+    "--block-url-pattern",
+    multiple=True,
+    type=click.STRING,
+    default=BROWSER_BLOCKED_URL_PATTERNS,
+    show_default=True,
+    help="Shell expression pattern of urls the browser does not load (analytics, fonts). Can be repeated, pass an empty string to block nothing.",
+)
+@click.option(
+    "--load-images",
+    is_flag=True,
+    default=False,
+    help="Let the browser load images (useful together with --browser-screenshots).",
+)
+@click.option(
+    "--record",
+    "record_path",
+    required=False,
+    default=None,
+    help="Record all NGR responses and linkage check results in this archive (zip) file.",
+    type=click.types.Path(
+        exists=False, file_okay=True, dir_okay=False, writable=True, allow_dash=False
+    ),
+)
+@click.option(
+    "--replay",
+    "replay_path",
+    required=False,
+    default=None,
+    help="Replay a run recorded with --record, without contacting the NGR, the INSPIRE linkage checker or selenium.",
+    type=click.types.Path(
+        exists=True, file_okay=True, dir_okay=False, readable=True, allow_dash=False
+    ),
+)
+@click.option(
+    "--result-store",
+    "result_store_path",
+    required=False,
+    default=None,
+    help="Also store the results in this sqlite database, which keeps the history of all runs.",
+    type=click.types.Path(
+        exists=False, file_okay=True, dir_okay=False, writable=True, allow_dash=False
+    ),
+)
+@click.option(
+    "--result-store-retention-days",
+    default=RESULT_STORE_RETENTION_DAYS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Runs older than this are deleted from the result store.",
+)
+@click.option(
+    "--force-remote",
+    is_flag=True,
+    default=False,
+    help="Run the INSPIRE linkage check also for datasets that fail the local pre-flight checks.",
+)
 @click_log.simple_verbosity_option(logger)
 def linkage_checker_command(
-    output_path, remote_selenium_url, enable_caching, browser_screenshots, debug_mode, uuid
+    output_path,
+    remote_selenium_url,
+    enable_caching,
+    cache_dir,
+    browser_screenshots,
+    debug_mode,
+    uuid,
+    profile_path,
+    workers,
+    headless,
+    page_load_strategy,
+    block_url_pattern,
+    load_images,
+    record_path,
+    replay_path,
+    result_store_path,
+    result_store_retention_days,
+    force_remote,
 ):
+    if record_path is not None and replay_path is not None:
+        raise click.UsageError("--record and --replay can not be combined.")
+
+    # imported here, so the cli starts without loading the harvest and check engines
+    from linkage_checker.core import main
+
     set_log_level()
 
     try:
@@ -88,11 +224,64 @@ def linkage_checker_command(
             browser_screenshots,
             debug_mode,
             uuid,
+            cache_dir,
+            profile_path,
+            workers,
+            {
+                "headless": headless,
+                "page_load_strategy": page_load_strategy,
+                "blocked_url_patterns": [p for p in block_url_pattern if p],
+                "load_images": load_images,
+            },
+            record_path,
+            replay_path,
+            result_store_path,
+            result_store_retention_days,
+            force_remote,
         )
     except AppError:
         logger.exception("linkage-checker failed:")
         sys.exit(1)
 
 
+@cli.command(name="export-results")
+@click.option(
+    "--result-store",
+    "result_store_path",
+    required=True,
+    help="Path to the sqlite database written with linkage-checker --result-store.",
+    type=click.types.Path(
+        exists=True, file_okay=True, dir_okay=False, readable=True, allow_dash=False
+    ),
+)
+@click.option(
+    "--run-id",
+    required=False,
+    default=None,
+    type=int,
+    help="Id of the run to export, defaults to the last run.",
+)
+@click.option(
+    "--output-path",
+    required=False,
+    default=None,
+    help="Path to a json file where the results will be written (same format as the linkage-checker output).",
+    type=click.types.Path(
+        exists=False, file_okay=True, dir_okay=False, writable=True, allow_dash=False
+    ),
+)
+@click_log.simple_verbosity_option(logger)
+def export_results_command(result_store_path, run_id, output_path):
+    from linkage_checker.core import export_results
+
+    set_log_level()
+
+    try:
+        export_results(result_store_path, output_path, run_id)
+    except AppError:
+        logger.exception("export-results failed:")
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     cli()
@@ -30,3 +30,81 @@ REMOTE_WEBDRIVER_CONNECTION_URL = "http://127.0.0.1:4444/wd/hub"
 TIMEOUT_SECONDS = 18000
 # 5 minutes
 TIMEOUT_SECONDS_DEBUG_MODE = 300
+
+# on-disk http response cache for the NGR endpoints (see http_cache.py)
+HTTP_CACHE_INDEX_FILENAME = "index.json"
+HTTP_CACHE_MAX_SIZE_BYTES = 512 * 1024 * 1024  # is 512 MB
+# time to live per endpoint, matched against the request url in this order.
+# within the ttl a stored response is served without contacting the server,
+# afterwards it is revalidated with a conditional request.
+HTTP_CACHE_TTL_SECONDS = (
+    ("request=GetRecords&", 3600),  # is 1 hour, paging results change often
+    ("request=GetRecordById&", 86400),  # is 1 day
+    ("/related?", 86400),  # is 1 day
+)
+HTTP_CACHE_DEFAULT_TTL_SECONDS = 3600
+
+# request timeouts (connect, read) for the NGR requests
+HTTP_TIMEOUT_SECONDS = (10, 120)
+# retries on 429, 5xx responses and connection errors
+HTTP_MAX_RETRIES = 5
+HTTP_RETRY_BACKOFF_SECONDS = 2
+HTTP_MAX_RETRY_AFTER_SECONDS = 300  # is 5 minutes
+
+# adaptive (AIMD) concurrency per host, see rate_control.py
+CONCURRENCY_INITIAL = 2
+CONCURRENCY_MINIMUM = 1
+CONCURRENCY_MAXIMUM = 16
+# maximum concurrency for hosts that need to be handled with more care
+CONCURRENCY_MAXIMUM_PER_HOST = {
+    "inspire-geoportal.ec.europa.eu": 4,
+}
+CONCURRENCY_DECREASE_FACTOR = 0.5
+# a request is a latency spike when it is slower than both of these
+LATENCY_SPIKE_FACTOR = 3
+LATENCY_SPIKE_MIN_SECONDS = 5
+# hosts running jobs of very varying duration (a linkage check takes minutes
+# to hours), they are only backed off on errors and timeouts
+LATENCY_SPIKE_EXEMPT_HOSTS = ("inspire-geoportal.ec.europa.eu",)
+
+# number of dataset records that are coupled and enriched ahead of the checks
+HARVEST_PREFETCH = 32
+# maximum number of harvested dataset records waiting to be checked
+PIPELINE_QUEUE_SIZE = 16
+
+# lean browser profile for the selenium sessions, see browser_profile.py
+BROWSER_PAGE_LOAD_STRATEGY = "eager"
+# shell expression patterns (as used by shExpMatch) of resources the browser
+# does not load, they are not needed to run the linkage checker
+BROWSER_BLOCKED_URL_PATTERNS = (
+    "*webanalytics.europa.eu*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+)
+# page on the linkage checker domain that is loaded to be able to set cookies
+# before the linkage checker itself is loaded
+BROWSER_COOKIE_SEED_URL = "https://inspire-geoportal.ec.europa.eu/favicon.ico"
+# cookie of the EC cookie consent kit, this skips the cookie consent banner
+BROWSER_CONSENT_COOKIES = (
+    {"name": "cck1", "value": '{"cm":true,"all1st":true,"closed":true}', "path": "/"},
+)
+
+# sqlite result history store, see result_store.py
+RESULT_STORE_BATCH_SIZE = 50
+RESULT_STORE_RETENTION_DAYS = 365
+
+# selenium grid scheduling, see grid.py
+GRID_STATUS_REFRESH_SECONDS = 5
+GRID_STATUS_TIMEOUT_SECONDS = 10
+# a grid that is unhealthy is left out of rotation for this long
+GRID_UNHEALTHY_COOLDOWN_SECONDS = 60
+# maximum time to wait for a free slot on any of the grids
+GRID_ACQUIRE_TIMEOUT_SECONDS = 3600  # is 1 hour
+# number of grids tried to create a browser session for one dataset
+GRID_SESSION_ATTEMPTS = 3
@@ -1,120 +1,361 @@
 import json
 import logging
 import sys
+import threading
 import traceback
+from contextlib import nullcontext
 from datetime import datetime
+from importlib import metadata
 from pathlib import Path
 
-import pkg_resources
-from selenium.common.exceptions import TimeoutException
-
 from linkage_checker.constants import (
+    GRID_SESSION_ATTEMPTS,
     NGR_UUID_URL,
     LINKAGE_CHECKER_URL,
+    RESULT_STORE_RETENTION_DAYS,
 )
-from linkage_checker.ngr import get_all_ngr_records
-from linkage_checker.linkage_check import run_linkage_checker_with_selenium
+from linkage_checker import http_client
+from linkage_checker.error import SessionError
+from linkage_checker.grid import GridScheduler
+from linkage_checker.ngr import iter_ngr_records
+from linkage_checker.pipeline import Pipeline
+from linkage_checker.preflight import PREFLIGHT_FAILED, Preflight
+from linkage_checker.profiling import PhaseProfiler
+from linkage_checker.rate_control import host_controllers
+from linkage_checker.recording import Recorder, Replayer
+from linkage_checker.result_store import ResultStore
 
 logger = logging.getLogger(__name__)
 
 
 def main(
-    output_path, remote_selenium_url, enable_caching, browser_screenshots, debug_mode, uuid
+    output_path,
+    remote_selenium_url,
+    enable_caching,
+    browser_screenshots,
+    debug_mode,
+    uuid,
+    cache_dir=None,
+    profile_path=None,
+    workers=1,
+    browser_profile_settings=None,
+    record_path=None,
+    replay_path=None,
+    result_store_path=None,
+    result_store_retention_days=RESULT_STORE_RETENTION_DAYS,
+    force_remote=False,
 ):
     logger.info("output path = " + str(output_path))
-    logger.info("remote_selenium_url = " + str(remote_selenium_url))
+    if isinstance(remote_selenium_url, str):
+        remote_selenium_url = [remote_selenium_url]
+    logger.info("remote_selenium_url = " + ", ".join(remote_selenium_url))
     logger.info("caching enabled = " + str(enable_caching))
+    logger.info("http cache directory = " + str(cache_dir))
     logger.info("make browser screenshots = " + str(browser_screenshots))
     logger.info("debug_mode = " + str(debug_mode))
+    logger.info("profile path = " + str(profile_path))
+    logger.info("workers = " + str(workers))
+    logger.info("browser profile settings = " + str(browser_profile_settings))
+    logger.info("record path = " + str(record_path))
+    logger.info("replay path = " + str(replay_path))
+    logger.info("result store = " + str(result_store_path))
+    logger.info("force remote = " + str(force_remote))
     if uuid:
         logger.info("uuid = " + ', '.join(uuid))
     else:
         logger.info("uuid = None")
 
     start_time = datetime.now()
+    linkage_checker_version = get_linkage_checker_version()
+    profiler = PhaseProfiler(profile_path)
+    recorder = Recorder(record_path) if record_path is not None else None
+    replayer = Replayer(replay_path) if replay_path is not None else None
+    if enable_caching and (recorder or replayer):
+        logger.warning(
+            "caching of the NGR records is disabled while recording or replaying"
+        )
+        enable_caching = False
+    result_store = None
+    if result_store_path is not None:
+        result_store = ResultStore(result_store_path)
+        result_store.prune(result_store_retention_days)
+        result_store_run_id = result_store.start_run(
+            start_time, linkage_checker_version
+        )
 
-    all_ngr_records = get_all_ngr_records(enable_caching)
+        def store_result(result):
+            result_store.add_result(result_store_run_id, result)
 
-    if debug_mode:
-        all_ngr_records = all_ngr_records[:3]
+    else:
+        store_result = None
+
+    try:
+        __run(
+            output_path,
+            remote_selenium_url,
+            enable_caching,
+            browser_screenshots,
+            debug_mode,
+            uuid,
+            cache_dir,
+            workers,
+            browser_profile_settings,
+            recorder,
+            replayer,
+            store_result,
+            force_remote,
+            profiler,
+            start_time,
+            linkage_checker_version,
+        )
+    finally:
+        if result_store is not None:
+            result_store.finish_run(result_store_run_id, datetime.now())
+            result_store.close()
+        host_controllers.report()
+        profiler.dump()
+        if recorder is not None:
+            recorder.close()
+        if replayer is not None:
+            replayer.close()
 
-    results = []
-    number_off_ngr_records = len(all_ngr_records)
 
-    logger.info("number of ngr records found: %d", number_off_ngr_records)
+def __run(
+    output_path,
+    remote_selenium_urls,
+    enable_caching,
+    browser_screenshots,
+    debug_mode,
+    uuid,
+    cache_dir,
+    workers,
+    browser_profile_settings,
+    recorder,
+    replayer,
+    store_result,
+    force_remote,
+    profiler,
+    start_time,
+    linkage_checker_version,
+):
+    # the selenium engine is only imported once there is something to check
+    from linkage_checker.browser_profile import BrowserProfile
+    from linkage_checker.linkage_check import run_linkage_checker_with_selenium
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    browser_profile = BrowserProfile(**(browser_profile_settings or {}))
 
     if uuid:
         only_uuids = set(uuid)
     else:
         only_uuids = None
 
-    for index in range(number_off_ngr_records):
-        ngr_record = all_ngr_records[index]
+    results = []
+    results_lock = threading.Lock()
+    # catalogue position of every dataset, the output is sorted on it
+    positions = {}
+    # set when the run is interrupted, checks still running are not written
+    stopped = threading.Event()
 
-        if only_uuids and not ngr_record["uuid"] in only_uuids:
-            logger.info(
-                "%s/%s skipping dataset %s (%s)",
-                index + 1,
-                number_off_ngr_records,
-                ngr_record["title"],
-                ngr_record["uuid"]
-            )
-            continue
+    def harvest():
+        with profiler.profile("harvest"):
+            number_off_ngr_records = 0
+            for ngr_record in iter_ngr_records(enable_caching):
+                if debug_mode and number_off_ngr_records >= 3:
+                    break
+                number_off_ngr_records += 1
 
+                if only_uuids and not ngr_record["uuid"] in only_uuids:
+                    logger.info(
+                        "%s skipping dataset %s (%s)",
+                        number_off_ngr_records,
+                        ngr_record["title"],
+                        ngr_record["uuid"]
+                    )
+                    continue
+
+                logger.info(
+                    "%s queueing dataset %s (%s)",
+                    number_off_ngr_records,
+                    ngr_record["title"],
+                    ngr_record["uuid"]
+                )
+                positions[ngr_record["uuid"]] = number_off_ngr_records
+                if preflight is not None:
+                    # probe the services while the dataset waits in the queue
+                    preflight.start(ngr_record)
+                yield ngr_record
+            logger.info("number of ngr records found: %d", number_off_ngr_records)
+
+    def check(ngr_record):
         logger.info(
-            "%s/%s validating dataset %s (%s)",
-            index + 1,
-            number_off_ngr_records,
+            "validating dataset %s (%s)",
             ngr_record["title"],
             ngr_record["uuid"]
         )
 
         start_time_detail = datetime.now()
 
-        try:
-            result = run_linkage_checker_with_selenium(ngr_record, browser_screenshots, remote_selenium_url, start_time_detail, debug_mode)
-        except Exception:
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            trace = [t.strip("\n") for t in traceback.format_exception(exc_type, exc_value, exc_traceback)]
-            result = {
-                "dataset_title": ngr_record["title"],
-                "status": "TIMEOUT" if exc_type == TimeoutException else "ERROR",
-                "error": trace,
-                "dataset_uuid": ngr_record["uuid"],
-                "endpoint_download_service": NGR_UUID_URL + ngr_record["download_service"]["uuid"],
-                "endpoint_view_service": NGR_UUID_URL + ngr_record["view_service"]["uuid"],
-                "endpoint_meta_data": NGR_UUID_URL + ngr_record["uuid"],
-                "duration": str(datetime.now() - start_time_detail),
-                "evaluation_report_url": None,
-                "linkage_check_results": None
-            }
-
-            logger.error(
-                "failed to validate dataset %s (%s): %s",
+        problems = preflight.problems(ngr_record) if preflight is not None else []
+        if problems:
+            logger.warning(
+                "skipping the linkage check of dataset %s (%s), it is certain to fail: %s",
                 ngr_record["title"],
                 ngr_record["uuid"],
-                trace)
+                problems)
+            result = __failed_result(ngr_record, PREFLIGHT_FAILED, problems, start_time_detail)
+        else:
+            result = remote_check(ngr_record, start_time_detail)
+
+        with results_lock:
+            if stopped.is_set():
+                return
+            if recorder is not None:
+                recorder.record_check(ngr_record["uuid"], result)
+            results.append(result)
+            results.sort(key=lambda result: positions.get(result["dataset_uuid"], 0))
+            logger.info("%d datasets validated", len(results))
+            if store_result is not None:
+                store_result(result)
+            write_output(output_path, start_time, results, linkage_checker_version)
 
-        results.append(result)
+    def remote_check(ngr_record, start_time_detail):
+        if replayer is not None:
+            # replayed checks are served as fast as possible
+            slot_context = nullcontext({})
+        else:
+            slot_context = host_controllers.for_url(LINKAGE_CHECKER_URL).slot()
 
-        write_output(output_path, start_time, results)
+        with slot_context as slot:
+            try:
+                with profiler.profile("check"):
+                    if replayer is not None:
+                        return replayer.check_result(ngr_record["uuid"])
+                    return run_on_grid(ngr_record, start_time_detail)
+            except Exception:
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                trace = [t.strip("\n") for t in traceback.format_exception(exc_type, exc_value, exc_traceback)]
+                # a check that times out or fails in the browser is a sign that
+                # the INSPIRE checker is overloaded, its duration is not
+                slot["overloaded"] = isinstance(exc_value, WebDriverException)
 
+                logger.error(
+                    "failed to validate dataset %s (%s): %s",
+                    ngr_record["title"],
+                    ngr_record["uuid"],
+                    trace)
+                return __failed_result(
+                    ngr_record,
+                    "TIMEOUT" if exc_type == TimeoutException else "ERROR",
+                    trace,
+                    start_time_detail,
+                )
 
-def write_output(output_path, start_time, results):
-    end_time = datetime.now()
+    def run_on_grid(ngr_record, start_time_detail):
+        # a session that can not be created is retried on another grid (node),
+        # instead of failing the dataset
+        for attempt in range(1, GRID_SESSION_ATTEMPTS + 1):
+            with grid_scheduler.session() as session:
+                try:
+                    return run_linkage_checker_with_selenium(ngr_record, browser_screenshots, session["url"], start_time_detail, debug_mode, browser_profile, recorder)
+                except SessionError:
+                    session["failed"] = True
+                    if attempt == GRID_SESSION_ATTEMPTS:
+                        raise
+                    logger.warning(
+                        "could not create a browser session on %s for dataset %s (%s), trying again",
+                        session["url"],
+                        ngr_record["title"],
+                        ngr_record["uuid"],
+                        exc_info=True)
+
+    grid_scheduler = GridScheduler(remote_selenium_urls)
+    if workers == 0 and replayer is None:
+        workers = max(1, grid_scheduler.capacity())
+        logger.info("using %d workers, the capacity of the selenium grids", workers)
+    workers = max(1, workers)
+
+    if force_remote:
+        preflight = None
+    else:
+        preflight = Preflight()
+
+    http_client.configure(cache_dir, recorder, replayer)
+    try:
+        # datasets are checked while the rest of the catalogue is still being harvested
+        Pipeline(harvest, check, workers).run()
+    except KeyboardInterrupt:
+        with results_lock:
+            stopped.set()
+        raise
+    finally:
+        if preflight is not None:
+            preflight.close()
+        http_client.close()
+
+
+def __failed_result(ngr_record, status, error, start_time_detail):
+    return {
+        "dataset_title": ngr_record["title"],
+        "status": status,
+        "error": error,
+        "dataset_uuid": ngr_record["uuid"],
+        "endpoint_download_service": NGR_UUID_URL + ngr_record["download_service"]["uuid"],
+        "endpoint_view_service": NGR_UUID_URL + ngr_record["view_service"]["uuid"],
+        "endpoint_meta_data": NGR_UUID_URL + ngr_record["uuid"],
+        "duration": str(datetime.now() - start_time_detail),
+        "evaluation_report_url": None,
+        "linkage_check_results": None
+    }
+
+
+def export_results(result_store_path, output_path, run_id=None):
+    """Writes a run of the result store in the json output format."""
+    result_store = ResultStore(result_store_path)
+    try:
+        run, start_time, end_time, results = result_store.load_run(run_id)
+    finally:
+        result_store.close()
+    logger.info("exporting %d results of run %d", len(results), run["id"])
+    write_output(
+        output_path,
+        start_time,
+        results,
+        run["version"],
+        end_time,
+        run["endpoint"],
+    )
+
+
+def get_linkage_checker_version():
+    try:
+        return metadata.version("linkage-checker")
+    except metadata.PackageNotFoundError:
+        logger.warning("linkage-checker is not installed, its version is unknown")
+        return None
+
+
+def write_output(
+    output_path,
+    start_time,
+    results,
+    linkage_checker_version,
+    end_time=None,
+    linkage_checker_endpoint=LINKAGE_CHECKER_URL,
+):
+    if end_time is None:
+        end_time = datetime.now()
     duration = end_time - start_time
 
     json_output = json.dumps(
         {
-            "linkage_checker_version": pkg_resources.require("linkage_checker")[
-                0
-            ].version,
+            "linkage_checker_version": linkage_checker_version,
             "start_time": start_time.strftime("%d-%m-%Y %H:%M:%S"),
             "start_time_timestamp": start_time.timestamp(),
             "end_time": end_time.strftime("%d-%m-%Y %H:%M:%S"),
             "end_time_timestamp": end_time.timestamp(),
             "total_duration": str(duration),
-            "linkage_checker_endpoint": LINKAGE_CHECKER_URL,
+            "linkage_checker_endpoint": linkage_checker_endpoint,
             "results": results,
         },
         indent=4,
@@ -1,2 +1,6 @@
 class AppError(Exception):
     """Class for handling application errrors."""
+
+
+class SessionError(AppError):
+    """Class for errors creating a browser session on a selenium grid."""
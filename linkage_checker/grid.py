@@ -0,0 +1,193 @@
+"""Scheduling of browser sessions over one or more selenium grids.
+
+The free slots of a grid are read from its /status endpoint. Selenium 4 grids
+report their nodes and slots, selenium 3 hubs and standalone servers only
+report whether they are ready for a new session (counted as one free slot).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from linkage_checker.constants import (
+    GRID_ACQUIRE_TIMEOUT_SECONDS,
+    GRID_STATUS_REFRESH_SECONDS,
+    GRID_STATUS_TIMEOUT_SECONDS,
+    GRID_UNHEALTHY_COOLDOWN_SECONDS,
+    REQUEST_HEADERS,
+)
+from linkage_checker.error import SessionError
+
+logger = logging.getLogger(__name__)
+
+
+class GridStatus:
+    def __init__(self, url):
+        self.url = url
+        self.healthy = False
+        self.capacity = 0
+        self.free_slots = 0
+        # sessions handed out and ended since the last status refresh
+        self.started = 0
+        self.ended = 0
+        self.in_use = 0
+        self.refreshed_at = None
+        self.unhealthy_until = 0.0
+
+    @property
+    def available_slots(self):
+        if not self.healthy or time.monotonic() < self.unhealthy_until:
+            return 0
+        return max(
+            0, min(self.capacity, self.free_slots - self.started + self.ended)
+        )
+
+
+class GridScheduler:
+    """Hands out the url of a grid with a free slot for every browser session.
+
+    Sessions are spread over the grids (the grid with the most available slots
+    first). A grid that can not be reached, has no available nodes or failed
+    to create a session is left out of rotation for unhealthy_cooldown seconds.
+    """
+
+    def __init__(
+        self,
+        grid_urls,
+        refresh_seconds=GRID_STATUS_REFRESH_SECONDS,
+        unhealthy_cooldown=GRID_UNHEALTHY_COOLDOWN_SECONDS,
+        acquire_timeout=GRID_ACQUIRE_TIMEOUT_SECONDS,
+    ):
+        self.grids = [GridStatus(url) for url in grid_urls]
+        self.refresh_seconds = refresh_seconds
+        self.unhealthy_cooldown = unhealthy_cooldown
+        self.acquire_timeout = acquire_timeout
+        self._condition = threading.Condition()
+
+    def capacity(self):
+        """Returns the total number of slots of the healthy grids."""
+        with self._condition:
+            self.__refresh(force=True)
+            return sum(grid.capacity for grid in self.grids if grid.healthy)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                self.__refresh()
+                grid = max(self.grids, key=lambda grid: grid.available_slots)
+                if grid.available_slots > 0:
+                    grid.started += 1
+                    grid.in_use += 1
+                    return grid.url
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SessionError(
+                        "no free slot on any selenium grid ({}) within {} seconds".format(
+                            ", ".join(grid.url for grid in self.grids),
+                            self.acquire_timeout,
+                        )
+                    )
+                # released slots wake us up earlier, otherwise poll the status
+                self._condition.wait(min(self.refresh_seconds, remaining))
+
+    def release(self, url, failed=False):
+        with self._condition:
+            grid = self.__grid(url)
+            grid.in_use -= 1
+            grid.ended += 1
+            if failed:
+                self.__take_out_of_rotation(grid, "could not create a session")
+            self._condition.notify_all()
+
+    @contextmanager
+    def session(self):
+        """Holds a slot during the with block, yields {"url": ..., "failed": False}.
+
+        Set session["failed"] to True in the block when the session could not be
+        created, so the grid is taken out of rotation.
+        """
+        session = {"url": self.acquire(), "failed": False}
+        try:
+            yield session
+        finally:
+            self.release(session["url"], session["failed"])
+
+    def __refresh(self, force=False):
+        now = time.monotonic()
+        for grid in self.grids:
+            if now < grid.unhealthy_until:
+                continue
+            if (
+                not force
+                and grid.refreshed_at is not None
+                and now - grid.refreshed_at < self.refresh_seconds
+            ):
+                continue
+
+            try:
+                response = requests.get(
+                    grid.url.rstrip("/") + "/status",
+                    headers=REQUEST_HEADERS,
+                    timeout=GRID_STATUS_TIMEOUT_SECONDS,
+                )
+                response.raise_for_status()
+                capacity, free_slots = parse_grid_status(response.json())
+            except (requests.RequestException, ValueError) as e:
+                self.__take_out_of_rotation(grid, "status not available: {}".format(e))
+                continue
+
+            grid.refreshed_at = now
+            grid.started = 0
+            grid.ended = 0
+            grid.capacity = capacity
+            grid.free_slots = free_slots
+            if capacity == 0:
+                self.__take_out_of_rotation(grid, "no available nodes")
+            else:
+                grid.healthy = True
+                logger.debug(
+                    "selenium grid %s: %d of %d slots free",
+                    grid.url,
+                    free_slots,
+                    capacity,
+                )
+
+    def __take_out_of_rotation(self, grid, reason):
+        logger.warning(
+            "selenium grid %s is taken out of rotation for %d seconds: %s",
+            grid.url,
+            self.unhealthy_cooldown,
+            reason,
+        )
+        grid.healthy = False
+        grid.refreshed_at = None
+        grid.unhealthy_until = time.monotonic() + self.unhealthy_cooldown
+
+    def __grid(self, url):
+        for grid in self.grids:
+            if grid.url == url:
+                return grid
+        raise ValueError("unknown selenium grid " + url)
+
+
+def parse_grid_status(status):
+    """Returns (capacity, free slots) from the json of a grid /status response."""
+    value = status.get("value", {})
+    if "nodes" not in value:
+        # selenium 3: only tells whether a new session can be started
+        ready = bool(value.get("ready", False))
+        return 1, int(ready)
+
+    capacity = 0
+    free_slots = 0
+    for node in value["nodes"]:
+        if node.get("availability", "UP") != "UP":
+            continue
+        slots = node.get("slots", [])
+        capacity += len(slots)
+        free_slots += sum(1 for slot in slots if slot.get("session") is None)
+    return capacity, free_slots
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from linkage_checker.constants import (
+    HTTP_CACHE_DEFAULT_TTL_SECONDS,
+    HTTP_CACHE_INDEX_FILENAME,
+    HTTP_CACHE_MAX_SIZE_BYTES,
+    HTTP_CACHE_TTL_SECONDS,
+)
+
+# number of index changes after which the index is written to disk
+INDEX_FLUSH_INTERVAL = 50
+
+logger = logging.getLogger(__name__)
+
+
+def build_response(url, status_code, headers, content, encoding=None):
+    """Creates a requests.Response for a response that was stored earlier."""
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers.update(headers)
+    response.encoding = encoding
+    response._content = content
+    return response
+
+
+class HttpCache:
+    """On-disk cache of http responses, revalidated with conditional requests.
+
+    Response bodies are stored in one file per url together with their ETag
+    and Last-Modified headers. A stored response is served as is while it is
+    younger than the ttl of its endpoint, after that it is revalidated with
+    If-None-Match/If-Modified-Since so an unchanged response only costs a 304.
+    The least recently used responses are evicted when the total size of the
+    stored bodies exceeds max_size_bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        max_size_bytes=HTTP_CACHE_MAX_SIZE_BYTES,
+        ttls=HTTP_CACHE_TTL_SECONDS,
+        default_ttl=HTTP_CACHE_DEFAULT_TTL_SECONDS,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._index_path = self.cache_dir / HTTP_CACHE_INDEX_FILENAME
+        self._index = self.__read_index()
+        self._pending_changes = 0
+
+    def get(self, url, headers=None, fetch=requests.get, **kwargs):
+        """Returns the response for url, from the cache when possible.
+
+        fetch is the function used to perform the actual (conditional) request,
+        it is called as fetch(url, headers=..., **kwargs).
+        """
+        key = self.__key(url)
+        entry, content = self.__lookup(key)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if time.time() - entry["stored_at"] < self.ttl_for(url):
+                logger.debug("http cache hit: " + url)
+                self.hits += 1
+                return self.__cached_response(key, entry, content)
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = fetch(url, headers=request_headers, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            logger.debug("http cache revalidated: " + url)
+            self.revalidated += 1
+            with self._lock:
+                entry["stored_at"] = time.time()
+                entry["etag"] = response.headers.get("ETag", entry.get("etag"))
+                entry["last_modified"] = response.headers.get(
+                    "Last-Modified", entry.get("last_modified")
+                )
+                self.__changed()
+            return self.__cached_response(key, entry, content)
+
+        self.misses += 1
+        if response.status_code == 200:
+            self.__store(key, url, response)
+        return response
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern in url:
+                return ttl
+        return self.default_ttl
+
+    def close(self):
+        with self._lock:
+            self.__write_index()
+        logger.info(
+            "http cache: %d hits, %d revalidated, %d misses, %d entries",
+            self.hits,
+            self.revalidated,
+            self.misses,
+            len(self._index),
+        )
+
+    def __store(self, key, url, response):
+        content = response.content
+        with self._lock:
+            body_path = self.__body_path(key)
+            tmp_path = body_path.with_suffix(".tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, body_path)
+            now = time.time()
+            self._index[key] = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_type": response.headers.get("Content-Type"),
+                "encoding": response.encoding,
+                "size": len(content),
+                "stored_at": now,
+                "last_access": now,
+            }
+            self.__evict()
+            self.__changed()
+
+    def __lookup(self, key):
+        """Returns the index entry and body for key, or (None, None) on a miss.
+
+        The body is read under the same lock as the index lookup, so another
+        thread can not evict it in between.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None, None
+            try:
+                content = self.__body_path(key).read_bytes()
+            except FileNotFoundError:
+                self.__remove(key)
+                return None, None
+            return entry, content
+
+    def __cached_response(self, key, entry, content):
+        with self._lock:
+            if key in self._index:
+                entry["last_access"] = time.time()
+                self.__changed()
+        headers = {
+            name: entry[field]
+            for name, field in (
+                ("Content-Type", "content_type"),
+                ("ETag", "etag"),
+                ("Last-Modified", "last_modified"),
+            )
+            if entry.get(field)
+        }
+        return build_response(
+            entry["url"], 200, headers, content, entry.get("encoding")
+        )
+
+    def __evict(self):
+        total_size = sum(entry["size"] for entry in self._index.values())
+        if total_size <= self.max_size_bytes:
+            return
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            total_size -= self._index[key]["size"]
+            self.__remove(key)
+            if total_size <= self.max_size_bytes:
+                break
+
+    def __remove(self, key):
+        self._index.pop(key, None)
+        try:
+            self.__body_path(key).unlink()
+        except FileNotFoundError:
+            pass
+        self.__changed()
+
+    def __changed(self):
+        self._pending_changes += 1
+        if self._pending_changes >= INDEX_FLUSH_INTERVAL:
+            self.__write_index()
+
+    def __read_index(self):
+        if not self._index_path.is_file():
+            return {}
+        try:
+            with open(self._index_path, encoding="utf-8") as infile:
+                return json.load(infile)
+        except ValueError:
+            logger.warning("ignoring corrupt http cache index " + str(self._index_path))
+            return {}
+
+    def __write_index(self):
+        tmp_path = self._index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+        self._pending_changes = 0
+
+    def __body_path(self, key):
+        return self.cache_dir / (key + ".body")
+
+    @staticmethod
+    def __key(url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
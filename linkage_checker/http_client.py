@@ -0,0 +1,54 @@
+"""Single entry point for all http requests done while harvesting the NGR."""
+import logging
+
+from linkage_checker.constants import HTTP_TIMEOUT_SECONDS, REQUEST_HEADERS
+from linkage_checker.http_cache import HttpCache
+from linkage_checker.rate_control import get_with_retries
+
+logger = logging.getLogger(__name__)
+
+_http_cache = None
+_recorder = None
+_replayer = None
+
+
+def configure(cache_dir=None, recorder=None, replayer=None):
+    """Sets up the http cache and the recording (or replaying) of responses.
+
+    The recorder and replayer (see recording.py) are owned by the caller,
+    close() does not close them.
+    """
+    global _http_cache, _recorder, _replayer
+    close()
+    if cache_dir is not None:
+        logger.debug("using http cache directory " + str(cache_dir))
+        _http_cache = HttpCache(cache_dir)
+    _recorder = recorder
+    _replayer = replayer
+
+
+def close():
+    global _http_cache, _recorder, _replayer
+    if _http_cache is not None:
+        _http_cache.close()
+        _http_cache = None
+    _recorder = None
+    _replayer = None
+
+
+def get(url):
+    if _replayer is not None:
+        return _replayer.response(url)
+
+    if _http_cache is not None:
+        response = _http_cache.get(url, headers=REQUEST_HEADERS, fetch=__fetch)
+    else:
+        response = __fetch(url, headers=REQUEST_HEADERS)
+
+    if _recorder is not None:
+        _recorder.record_response(url, response)
+    return response
+
+
+def __fetch(url, headers):
+    return get_with_retries(url, headers=headers, timeout=HTTP_TIMEOUT_SECONDS)
@@ -3,11 +3,12 @@ from datetime import datetime
 
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
-from selenium.webdriver import DesiredCapabilities
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.support.wait import WebDriverWait
 
+from linkage_checker.browser_profile import BrowserProfile
+from linkage_checker.error import SessionError
 from linkage_checker.constants import LINKAGE_CHECKER_URL, BROWSER_SCREENSHOT_PATH, NGR_UUID_URL, TIMEOUT_SECONDS, \
     TIMEOUT_SECONDS_DEBUG_MODE
 
@@ -20,8 +21,17 @@ def query_dom(browser, search_term, css_selector):
 
 
 def run_linkage_checker_with_selenium(
-    ngr_record, browser_screenshots, remote_selenium_url, start_time, debug_mode
+    ngr_record,
+    browser_screenshots,
+    remote_selenium_url,
+    start_time,
+    debug_mode,
+    browser_profile=None,
+    recorder=None,
 ):
+    if browser_profile is None:
+        browser_profile = BrowserProfile()
+
     logger.debug(
         'starting linkage check with dataset "'
         + ngr_record["title"]
@@ -31,12 +41,19 @@ def run_linkage_checker_with_selenium(
     )
 
     logger.debug("connecting to remote Firefox browser (in docker container)...")
-    browser = webdriver.Remote(
-        command_executor=remote_selenium_url,
-        desired_capabilities=DesiredCapabilities.FIREFOX,
-    )
+    try:
+        browser = webdriver.Remote(
+            command_executor=remote_selenium_url,
+            desired_capabilities=browser_profile.desired_capabilities(),
+        )
+    except Exception as e:
+        raise SessionError(
+            "could not create a browser session on " + remote_selenium_url
+        ) from e
     logger.debug("connected!")
 
+    browser_profile.seed_cookies(browser)
+
     # this prevents some possible "element not interactable" exceptions
     # https://www.selenium.dev/docs/site/en/webdriver/waits/#implicit-wait
     browser.implicitly_wait(10)
@@ -47,11 +64,14 @@ def run_linkage_checker_with_selenium(
     if browser_screenshots:
         browser.save_screenshot(BROWSER_SCREENSHOT_PATH)
 
-    # accept coockies (if requested)
+    # accept coockies (if requested, the consent cookie of the browser profile normally prevents this)
+    # without implicit wait, so a missing cookie consent banner is not waited for
     #
-    element = browser.find_element_by_css_selector("a.wt-link.cck-actions-button.ea_ignore")
-    if element:
-        element.click()
+    browser.implicitly_wait(0)
+    elements = browser.find_elements_by_css_selector("a.wt-link.cck-actions-button.ea_ignore")
+    browser.implicitly_wait(10)
+    if elements:
+        elements[0].click()
         browser.find_element_by_css_selector("div.cck-actions a.wt-link").click()
 
     if browser_screenshots:
@@ -116,6 +136,8 @@ def run_linkage_checker_with_selenium(
             + ngr_record["uuid"]
             + ")"
         )
+        if recorder is not None:
+            recorder.record_page_source(ngr_record["uuid"], browser.page_source)
         browser.quit()
         raise
 
@@ -234,5 +256,8 @@ def run_linkage_checker_with_selenium(
         "linkage_check_results": linkage_check_results,
     }
 
+    if recorder is not None:
+        recorder.record_page_source(ngr_record["uuid"], browser.page_source)
+
     browser.quit()
     return results
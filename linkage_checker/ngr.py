@@ -2,14 +2,16 @@ import json
 import logging
 import os
 import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-import requests
-
+from linkage_checker import http_client
 from linkage_checker.constants import (
     CACHE_FILENAME,
     CACHE_EXPIRATION_IN_SECONDS,
-    REQUEST_HEADERS,
+    CONCURRENCY_MAXIMUM,
+    HARVEST_PREFETCH,
     NAMESPACE_PREFIXES,
     NGR_BASE_URL,
 )
@@ -21,6 +23,17 @@ logger = logging.getLogger(__name__)
 
 
 def get_all_ngr_records(enable_caching):
+    return list(iter_ngr_records(enable_caching))
+
+
+def iter_ngr_records(enable_caching):
+    """Yields the coupled and enriched ngr dataset records.
+
+    Records are yielded in catalogue order as soon as their coupling is
+    resolved, so a consumer can start working on them while the rest of the
+    catalogue is harvested. At most HARVEST_PREFETCH records are resolved
+    ahead of the consumer.
+    """
     # if there is no cache file or it is expired, create it. otherwise read the cache file
     if not os.path.isfile(CACHE_FILENAME) or cache_is_expired() or not enable_caching:
         logger.debug("downloading ngr record data...")
@@ -28,53 +41,88 @@ def get_all_ngr_records(enable_caching):
         ngr_service_records = __get_all_ngr_records(
             "type='service'+AND+organisationName='Beheer+PDOK'"
         )
-        __enrich_ngr_service_records(ngr_service_records)
 
-        ngr_records_to_remove = []
-        for ngr_record in ngr_dataset_records:
-            record_info = get_ngr_record_info(ngr_record["uuid"], ngr_service_records)
-            if len(record_info) == 1:
-                warning = "only one PDOK service is coupled to datasets {}".format(
-                    ngr_record["title"]
-                )
-                logger.warning(warning)
-            if len(record_info) != 2:
-                ngr_records_to_remove.append(ngr_record)
-            else:
-                ngr_record.update(record_info)
-                __enrich_ngr_dataset_record(ngr_record)
-
-        for ngr_record_to_remove in ngr_records_to_remove:
-            ngr_dataset_records.remove(ngr_record_to_remove)
+        coupled_ngr_dataset_records = []
+        # the number of requests that are actually in flight is limited per host
+        # by the adaptive concurrency control in rate_control.py
+        with ThreadPoolExecutor(max_workers=CONCURRENCY_MAXIMUM) as executor:
+            list(executor.map(__enrich_ngr_service_record, ngr_service_records))
+            for ngr_record in __iter_coupled_ngr_dataset_records(
+                executor, ngr_dataset_records, ngr_service_records
+            ):
+                __validate_consistancy(ngr_record)
+                coupled_ngr_dataset_records.append(ngr_record)
+                yield ngr_record
 
+        # only reached when the whole catalogue has been harvested
         if enable_caching:
             logger.debug("writing all ngr record data to cache file " + CACHE_FILENAME)
             with open(CACHE_FILENAME, "w", encoding="utf-8") as f:
-                json.dump(ngr_dataset_records, f, ensure_ascii=False, indent=4)
+                json.dump(coupled_ngr_dataset_records, f, ensure_ascii=False, indent=4)
     else:
         logger.debug("reading ngr records from cache file " + CACHE_FILENAME)
         with open(CACHE_FILENAME) as infile:
             ngr_dataset_records = json.load(infile)
-    __validate_consistancy(ngr_dataset_records)
-    return ngr_dataset_records
+        for ngr_record in ngr_dataset_records:
+            __validate_consistancy(ngr_record)
+            yield ngr_record
 
 
-def __validate_consistancy(ngr_dataset_records):
-    for ngr_dataset_record in ngr_dataset_records:
-        validatie_identifiers(ngr_dataset_record, ngr_dataset_record["view_service"])
-        validatie_identifiers(
-            ngr_dataset_record, ngr_dataset_record["download_service"]
+def __iter_coupled_ngr_dataset_records(
+    executor, ngr_dataset_records, ngr_service_records
+):
+    pending = deque()
+    remaining_ngr_dataset_records = iter(ngr_dataset_records)
+    while True:
+        while len(pending) < HARVEST_PREFETCH:
+            ngr_record = next(remaining_ngr_dataset_records, None)
+            if ngr_record is None:
+                break
+            future = executor.submit(
+                __couple_ngr_dataset_record, ngr_record, ngr_service_records
+            )
+            pending.append((future, ngr_record))
+        if not pending:
+            return
+
+        future, ngr_record = pending.popleft()
+        if future.result():
+            yield ngr_record
+
+
+def __couple_ngr_dataset_record(ngr_record, ngr_service_records):
+    record_info = get_ngr_record_info(ngr_record["uuid"], ngr_service_records)
+    if len(record_info) == 1:
+        warning = "only one PDOK service is coupled to datasets {}".format(
+            ngr_record["title"]
         )
+        logger.warning(warning)
+    if len(record_info) != 2:
+        return False
+    ngr_record.update(record_info)
+    __enrich_ngr_dataset_record(ngr_record)
+    return True
+
+
+def __validate_consistancy(ngr_dataset_record):
+    validatie_identifiers(ngr_dataset_record, ngr_dataset_record["view_service"])
+    validatie_identifiers(ngr_dataset_record, ngr_dataset_record["download_service"])
 
 
 def validatie_identifiers(ngr_dataset_record, ngr_service_record):
+    for warning in get_identifier_problems(ngr_dataset_record, ngr_service_record):
+        logger.warning(warning)
+
+
+def get_identifier_problems(ngr_dataset_record, ngr_service_record):
+    problems = []
     if not ngr_dataset_record["identifier"] or ngr_dataset_record[
         "identifier"
     ].startswith("\n"):
         warning = "no identifier was resolved for dataset '{}'. link: https://nationaalgeoregister.nl/geonetwork/srv/dut/catalog.search#/metadata/{}.".format(
             ngr_dataset_record["title"], ngr_dataset_record["uuid"]
         )
-        logger.warning(warning)
+        problems.append(warning)
     else:
         for coupled_data in ngr_service_record["coupled_datasets"]:
             if (
@@ -88,7 +136,8 @@ def validatie_identifiers(ngr_dataset_record, ngr_service_record):
                     ngr_service_record["title"],
                     ngr_service_record["uuid"],
                 )
-                logger.warning(warning)
+                problems.append(warning)
+    return problems
 
 
 def cache_is_expired():
@@ -116,7 +165,7 @@ def __get_all_ngr_records(constraint):
             + str(start_position)
         )
         logger.info("fetching records_base_url: " + records_base_url)
-        response = requests.get(records_base_url, headers=REQUEST_HEADERS)
+        response = http_client.get(records_base_url)
         document = ET.fromstring(response.content)
 
         ex_node = document.findall("./ows:ExceptionReport", NAMESPACE_PREFIXES)
@@ -163,7 +212,7 @@ def get_ngr_record_info(uuid_dataset, ngr_service_records):
         + uuid_dataset
         + "/related?type=services&start=1&rows=100"
     )
-    response = requests.get(record_info_base_url, headers=REQUEST_HEADERS)
+    response = http_client.get(record_info_base_url)
     document = ET.fromstring(response.content)
 
     items = document.iter("item")
@@ -249,42 +298,42 @@ def __find_in_service_records(uuid, ngr_service_records):
     return None
 
 
-def __enrich_ngr_service_records(ngr_service_records):
-    for ngr_record in ngr_service_records:
-        response = __get_full_ngr_record(ngr_record["uuid"])
-        document = ET.fromstring(response.content)
-
-        service_access_point = document.find(
-            ".//gmd:transferOptions/gmd:MD_DigitalTransferOptions/gmd:onLine/gmd:CI_OnlineResource/gmd:linkage/gmd:URL",
-            NAMESPACE_PREFIXES,
-        ).text
-        service_type = document.find(
-            ".//srv:SV_ServiceIdentification/srv:serviceType/gco:LocalName",
-            NAMESPACE_PREFIXES,
-        ).text
+def __enrich_ngr_service_record(ngr_record):
+    response = __get_full_ngr_record(ngr_record["uuid"])
+    document = ET.fromstring(response.content)
 
-        ngr_record["coupled_datasets"] = []
-        for operates_on in document.findall(
-            ".//srv:SV_ServiceIdentification/srv:operatesOn", NAMESPACE_PREFIXES
-        ):
-            href = operates_on.get("{{{}}}href".format(NAMESPACE_PREFIXES["xlink"]))
-            dataset_metadata_uuid = __get_request_parameter_value(href, "id").split(
-                "#", 1
-            )[0]
-            dataset_identifier = operates_on.get("uuidref")
-            dataset = {
-                "metadata_uuid": dataset_metadata_uuid,
-                "identifier": dataset_identifier,
-            }
-            ngr_record["coupled_datasets"].append(dataset)
+    service_access_point = document.find(
+        ".//gmd:transferOptions/gmd:MD_DigitalTransferOptions/gmd:onLine/gmd:CI_OnlineResource/gmd:linkage/gmd:URL",
+        NAMESPACE_PREFIXES,
+    ).text
+    service_type = document.find(
+        ".//srv:SV_ServiceIdentification/srv:serviceType/gco:LocalName",
+        NAMESPACE_PREFIXES,
+    ).text
 
-        ngr_record["service_type"] = service_type
-        ngr_record["service_access_point"] = service_access_point
-        if not __is_quality_conformance_met(document):
-            warning = "not all quality conformances are met for service {} ref:https://nationaalgeoregister.nl/geonetwork/srv/dut/catalog.search#/metadata/{}".format(
-                ngr_record["title"], ngr_record["uuid"]
-            )
-            logger.warning(warning)
+    ngr_record["coupled_datasets"] = []
+    for operates_on in document.findall(
+        ".//srv:SV_ServiceIdentification/srv:operatesOn", NAMESPACE_PREFIXES
+    ):
+        href = operates_on.get("{{{}}}href".format(NAMESPACE_PREFIXES["xlink"]))
+        dataset_metadata_uuid = __get_request_parameter_value(href, "id").split(
+            "#", 1
+        )[0]
+        dataset_identifier = operates_on.get("uuidref")
+        dataset = {
+            "metadata_uuid": dataset_metadata_uuid,
+            "identifier": dataset_identifier,
+        }
+        ngr_record["coupled_datasets"].append(dataset)
+
+    ngr_record["service_type"] = service_type
+    ngr_record["service_access_point"] = service_access_point
+    ngr_record["quality_conformance_met"] = __is_quality_conformance_met(document)
+    if not ngr_record["quality_conformance_met"]:
+        warning = "not all quality conformances are met for service {} ref:https://nationaalgeoregister.nl/geonetwork/srv/dut/catalog.search#/metadata/{}".format(
+            ngr_record["title"], ngr_record["uuid"]
+        )
+        logger.warning(warning)
 
 
 def __get_full_ngr_record(uuid):
@@ -292,7 +341,7 @@ def __get_full_ngr_record(uuid):
         NGR_BASE_URL, uuid
     )
     logger.info("fetching record_info_base_url: " + record_info_base_url)
-    response = requests.get(record_info_base_url, headers=REQUEST_HEADERS)
+    response = http_client.get(record_info_base_url)
     return response
 
 
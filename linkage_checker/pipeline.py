@@ -0,0 +1,101 @@
+import logging
+import queue
+import threading
+
+from linkage_checker.constants import PIPELINE_QUEUE_SIZE
+
+# seconds between checks whether the pipeline has been stopped
+POLL_INTERVAL_SECONDS = 0.5
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Pipeline:
+    """Runs a producer and consumers in threads, connected by a bounded queue.
+
+    produce is called once and should return an iterable (preferably a
+    generator) of items, every item is passed to consume by one of the
+    workers. The producer blocks while the queue is full, so it never runs
+    more than queue_size items ahead of the consumers.
+
+    When the producer fails the items already queued are still consumed, when
+    a consumer fails the whole pipeline stops. In both cases the first error
+    is raised by run().
+
+    On a KeyboardInterrupt run() stops the producer and the idle consumers and
+    raises it right away. The threads are daemon threads, consumers that are
+    still busy with an item are abandoned.
+    """
+
+    def __init__(self, produce, consume, workers=1, queue_size=PIPELINE_QUEUE_SIZE):
+        self.produce = produce
+        self.consume = consume
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopped = threading.Event()
+        self._errors = []
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self.__produce, name="producer", daemon=True)
+        ]
+        threads += [
+            threading.Thread(
+                target=self.__consume, name="consumer-{}".format(i + 1), daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            logger.warning("interrupted, stopping the pipeline")
+            self._stopped.set()
+            for thread in threads:
+                thread.join(timeout=2 * POLL_INTERVAL_SECONDS)
+            raise
+
+        if self._errors:
+            raise self._errors[0]
+
+    def __produce(self):
+        items = iter(self.produce())
+        try:
+            for item in items:
+                if not self.__put(item):
+                    break
+        except Exception as e:
+            logger.exception("producer failed:")
+            self._errors.append(e)
+        finally:
+            getattr(items, "close", lambda: None)()
+            for _ in range(self.workers):
+                self.__put(_DONE)
+
+    def __consume(self):
+        while not self._stopped.is_set():
+            try:
+                item = self._queue.get(timeout=POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            try:
+                self.consume(item)
+            except Exception as e:
+                logger.exception("consumer failed:")
+                self._errors.append(e)
+                self._stopped.set()
+
+    def __put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_INTERVAL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
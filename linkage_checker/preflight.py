@@ -0,0 +1,111 @@
+"""Local checks that find datasets that are certain to fail the INSPIRE linkage check.
+
+Besides the problems already known from the NGR harvest (missing or
+mismatching identifiers, unmet quality conformances) the access point of every
+coupled service is probed with a GetCapabilities request (or a plain request
+for atom feeds). Probes run in parallel and every service is probed once per
+run.
+"""
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from linkage_checker import http_client
+from linkage_checker.constants import CONCURRENCY_MAXIMUM
+from linkage_checker.ngr import get_identifier_problems
+
+PREFLIGHT_FAILED = "PREFLIGHT_FAILED"
+
+SERVICE_PROTOCOLS = {"view": "WMS", "download": "WFS"}
+EXCEPTION_REPORT_TAGS = ("ExceptionReport", "ServiceExceptionReport")
+
+logger = logging.getLogger(__name__)
+
+
+class Preflight:
+    def __init__(self, max_workers=CONCURRENCY_MAXIMUM):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="preflight"
+        )
+        self._probes = {}
+        self._lock = threading.Lock()
+
+    def start(self, ngr_record):
+        """Starts probing the services of a dataset record in the background."""
+        for service_key in ("view_service", "download_service"):
+            self.__probe(ngr_record[service_key])
+
+    def problems(self, ngr_record):
+        """Returns the reasons why the linkage check of this dataset will fail."""
+        problems = []
+        for service_key in ("view_service", "download_service"):
+            ngr_service_record = ngr_record[service_key]
+            for problem in get_identifier_problems(ngr_record, ngr_service_record):
+                if problem not in problems:
+                    problems.append(problem)
+            if not ngr_service_record.get("quality_conformance_met", True):
+                problems.append(
+                    "not all quality conformances are met for service '{}' ({})".format(
+                        ngr_service_record["title"], ngr_service_record["uuid"]
+                    )
+                )
+            probe_problem = self.__probe(ngr_service_record).result()
+            if probe_problem is not None:
+                problems.append(probe_problem)
+        return problems
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __probe(self, ngr_service_record):
+        url = get_probe_url(ngr_service_record)
+        with self._lock:
+            if url not in self._probes:
+                self._probes[url] = self._executor.submit(
+                    probe_service, url, ngr_service_record
+                )
+            return self._probes[url]
+
+
+def get_probe_url(ngr_service_record):
+    url = ngr_service_record["service_access_point"]
+    protocol = SERVICE_PROTOCOLS.get(ngr_service_record["service_type"])
+    if protocol is None or "atom" in url.lower() or "request=" in url.lower():
+        return url
+    if url.endswith(("?", "&")):
+        separator = ""
+    else:
+        separator = "&" if "?" in url else "?"
+    return "{}{}service={}&request=GetCapabilities".format(url, separator, protocol)
+
+
+def probe_service(url, ngr_service_record):
+    """Returns a problem description when the service does not respond properly."""
+    try:
+        response = http_client.get(url)
+    except Exception as e:
+        problem = "service access point {} of service '{}' is unreachable: {}".format(
+            url, ngr_service_record["title"], e
+        )
+    else:
+        problem = __get_response_problem(response)
+        if problem is not None:
+            problem = "service access point {} of service '{}' {}".format(
+                url, ngr_service_record["title"], problem
+            )
+    if problem is not None:
+        logger.warning(problem)
+    return problem
+
+
+def __get_response_problem(response):
+    if response.status_code != 200:
+        return "responded with status {}".format(response.status_code)
+    try:
+        document = ET.fromstring(response.content)
+    except ET.ParseError as e:
+        return "did not respond with xml: {}".format(e)
+    if document.tag.rsplit("}", 1)[-1] in EXCEPTION_REPORT_TAGS:
+        return "responded with an exception report"
+    return None
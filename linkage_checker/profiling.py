@@ -0,0 +1,60 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+from contextlib import contextmanager
+
+# number of functions logged per phase, sorted by cumulative time
+PROFILE_TOP_FUNCTIONS = 25
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseProfiler:
+    """Collects cProfile statistics per phase of a run (e.g. harvest, check).
+
+    A phase may be profiled several times and from several threads, the
+    statistics are added up and written to "<profile_path>.<phase>.pstats"
+    by dump(). These files can be inspected with `python -m pstats` or tools
+    like snakeviz. When profile_path is None profiling is disabled.
+    """
+
+    def __init__(self, profile_path):
+        self.profile_path = profile_path
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, phase):
+        if self.profile_path is None:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                if phase in self._stats:
+                    self._stats[phase].add(profiler)
+                else:
+                    self._stats[phase] = pstats.Stats(profiler)
+
+    def dump(self):
+        with self._lock:
+            for phase, stats in self._stats.items():
+                stats_path = "{}.{}.pstats".format(self.profile_path, phase)
+                stats.dump_stats(stats_path)
+
+                stream = io.StringIO()
+                stats.stream = stream
+                stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+                logger.info(
+                    "profile of phase %s written to %s\n%s",
+                    phase,
+                    stats_path,
+                    stream.getvalue(),
+                )
@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from linkage_checker.constants import (
+    CONCURRENCY_DECREASE_FACTOR,
+    CONCURRENCY_INITIAL,
+    CONCURRENCY_MAXIMUM,
+    CONCURRENCY_MAXIMUM_PER_HOST,
+    CONCURRENCY_MINIMUM,
+    HTTP_MAX_RETRIES,
+    HTTP_MAX_RETRY_AFTER_SECONDS,
+    HTTP_RETRY_BACKOFF_SECONDS,
+    LATENCY_SPIKE_EXEMPT_HOSTS,
+    LATENCY_SPIKE_FACTOR,
+    LATENCY_SPIKE_MIN_SECONDS,
+)
+
+# weight of a new latency sample in the moving average
+LATENCY_SMOOTHING = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyController:
+    """Limits the number of concurrent requests to one host (AIMD).
+
+    The limit grows by one for every `limit` healthy requests done while the
+    limit was reached (additive increase) and is multiplied by
+    CONCURRENCY_DECREASE_FACTOR on a 429, 5xx, connection error or latency
+    spike (multiplicative decrease). A burst of failures of requests that were
+    in flight together counts as one decrease. Latency spikes are ignored when
+    latency_spikes is False.
+    """
+
+    def __init__(
+        self,
+        host,
+        initial=CONCURRENCY_INITIAL,
+        minimum=CONCURRENCY_MINIMUM,
+        maximum=CONCURRENCY_MAXIMUM,
+        latency_spikes=True,
+    ):
+        self.host = host
+        self.latency_spikes = latency_spikes
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.overloaded = 0
+        self.latency = None
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, latency, overloaded=False):
+        with self._condition:
+            limit_reached = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.requests += 1
+            if overloaded:
+                self.overloaded += 1
+                self.__decrease("overloaded")
+            elif self.__is_latency_spike(latency):
+                self.__decrease("latency spike of {:.1f}s".format(latency))
+            elif limit_reached:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            if not overloaded:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Stops handing out slots for this host for the given number of seconds."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @contextmanager
+    def slot(self):
+        """Holds a slot during the with block.
+
+        Set slot["overloaded"] to True in the block to signal that the host is
+        overloaded.
+        """
+        self.acquire()
+        start = time.monotonic()
+        slot = {"overloaded": False}
+        try:
+            yield slot
+        finally:
+            self.release(time.monotonic() - start, slot["overloaded"])
+
+    def __is_latency_spike(self, latency):
+        return (
+            self.latency_spikes
+            and self.latency is not None
+            and latency > LATENCY_SPIKE_MIN_SECONDS
+            and latency > LATENCY_SPIKE_FACTOR * self.latency
+        )
+
+    def __decrease(self, reason):
+        now = time.monotonic()
+        # decrease at most once per round trip
+        if now - self._last_decrease < (self.latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * CONCURRENCY_DECREASE_FACTOR)
+        logger.info(
+            "%s: backing off to concurrency %d (%s)", self.host, self.limit, reason
+        )
+
+
+class HostConcurrencyControllers:
+    """A ConcurrencyController per host, created on first use."""
+
+    def __init__(self):
+        self._controllers = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlsplit(url).hostname
+        with self._lock:
+            if host not in self._controllers:
+                self._controllers[host] = ConcurrencyController(
+                    host,
+                    maximum=CONCURRENCY_MAXIMUM_PER_HOST.get(host, CONCURRENCY_MAXIMUM),
+                    latency_spikes=host not in LATENCY_SPIKE_EXEMPT_HOSTS,
+                )
+            return self._controllers[host]
+
+    def report(self):
+        with self._lock:
+            controllers = list(self._controllers.values())
+        for controller in controllers:
+            logger.info(
+                "%s: settled on concurrency %d (peak in flight %d, %d requests, %d overloaded, average latency %.2fs)",
+                controller.host,
+                controller.limit,
+                controller.peak_in_flight,
+                controller.requests,
+                controller.overloaded,
+                controller.latency or 0,
+            )
+
+
+host_controllers = HostConcurrencyControllers()
+
+
+def get_with_retries(url, controllers=host_controllers, fetch=requests.get, **kwargs):
+    """Performs fetch(url, **kwargs) within the concurrency limit of the host.
+
+    Requests that end in a 429, a 5xx or a connection error are retried after
+    the Retry-After of the response or an exponential backoff. The last
+    response is returned (or the last error raised) when all retries failed.
+    """
+    controller = controllers.for_url(url)
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        response = None
+        with controller.slot() as slot:
+            try:
+                response = fetch(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                slot["overloaded"] = True
+                if last_attempt:
+                    raise
+                reason = str(e)
+            else:
+                slot["overloaded"] = (
+                    response.status_code == 429 or response.status_code >= 500
+                )
+                reason = "status {}".format(response.status_code)
+
+        if not slot["overloaded"] or last_attempt:
+            return response
+
+        retry_after = __get_retry_after(response)
+        if retry_after is not None:
+            logger.warning(
+                "request %s failed (%s), %s asks to retry after %d seconds",
+                url,
+                reason,
+                controller.host,
+                retry_after,
+            )
+            controller.pause(retry_after)
+        else:
+            backoff = HTTP_RETRY_BACKOFF_SECONDS * 2**attempt
+            logger.warning(
+                "request %s failed (%s), retrying in %d seconds", url, reason, backoff
+            )
+            time.sleep(backoff)
+
+
+def __get_retry_after(response):
+    if response is None or "Retry-After" not in response.headers:
+        return None
+    value = response.headers["Retry-After"].strip()
+    if value.isdigit():
+        seconds = int(value)
+    else:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return max(0, min(seconds, HTTP_MAX_RETRY_AFTER_SECONDS))
@@ -0,0 +1,131 @@
+"""Record/replay archives of the http responses and linkage check results of a run.
+
+An archive is a zip file with one deflated entry per http response, per
+linkage check result and per final linkage checker DOM, plus an index.json
+that maps every url and dataset uuid to its entries in the order they were
+recorded. Replaying an archive serves these back without contacting the NGR,
+the INSPIRE linkage checker or a selenium grid.
+"""
+import json
+import logging
+import threading
+import zipfile
+from collections import defaultdict
+
+from linkage_checker.error import AppError
+from linkage_checker.http_cache import build_response
+
+INDEX_ENTRY = "index.json"
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self._archive = zipfile.ZipFile(
+            archive_path, "w", compression=zipfile.ZIP_DEFLATED
+        )
+        self._index = {
+            "http": defaultdict(list),
+            "checks": defaultdict(list),
+            "pages": defaultdict(list),
+        }
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def record_response(self, url, response):
+        with self._lock:
+            name = self.__next_name("http")
+            self._archive.writestr(name + ".body", response.content)
+            self.__write_json(
+                name + ".json",
+                {
+                    "url": url,
+                    "status_code": response.status_code,
+                    "headers": dict(response.headers),
+                    "encoding": response.encoding,
+                },
+            )
+            self._index["http"][url].append(name)
+
+    def record_check(self, dataset_uuid, result):
+        with self._lock:
+            name = self.__next_name("checks")
+            self.__write_json(name + ".json", result)
+            self._index["checks"][dataset_uuid].append(name)
+
+    def record_page_source(self, dataset_uuid, page_source):
+        """Records the final DOM of the linkage checker (for offline inspection)."""
+        with self._lock:
+            name = self.__next_name("pages")
+            self._archive.writestr(name + ".html", page_source)
+            self._index["pages"][dataset_uuid].append(name)
+
+    def close(self):
+        with self._lock:
+            self.__write_json(INDEX_ENTRY, self._index)
+            self._archive.close()
+        logger.info(
+            "recorded %d http responses and %d linkage checks in %s",
+            sum(len(names) for names in self._index["http"].values()),
+            sum(len(names) for names in self._index["checks"].values()),
+            self.archive_path,
+        )
+
+    def __next_name(self, kind):
+        self._sequence += 1
+        return "{}/{:08d}".format(kind, self._sequence)
+
+    def __write_json(self, name, content):
+        self._archive.writestr(name, json.dumps(content, ensure_ascii=False))
+
+
+class Replayer:
+    """Serves the responses and check results of an archive.
+
+    When a url (or dataset) was recorded more than once the recordings are
+    served in the recorded order, after the last one that one is repeated.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self._archive = zipfile.ZipFile(archive_path, "r")
+        try:
+            self._index = json.loads(self._archive.read(INDEX_ENTRY))
+        except KeyError:
+            raise AppError("{} is not a linkage-checker archive".format(archive_path))
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def response(self, url):
+        name = self.__next("http", url)
+        with self._lock:
+            meta = json.loads(self._archive.read(name + ".json"))
+            content = self._archive.read(name + ".body")
+        return build_response(
+            meta["url"],
+            meta["status_code"],
+            meta["headers"],
+            content,
+            meta["encoding"],
+        )
+
+    def check_result(self, dataset_uuid):
+        name = self.__next("checks", dataset_uuid)
+        with self._lock:
+            return json.loads(self._archive.read(name + ".json"))
+
+    def close(self):
+        self._archive.close()
+
+    def __next(self, kind, key):
+        names = self._index[kind].get(key)
+        if not names:
+            raise AppError(
+                "{} has no recording of {} {}".format(self.archive_path, kind, key)
+            )
+        with self._lock:
+            served = self._served[(kind, key)]
+            self._served[(kind, key)] += 1
+        return names[min(served, len(names) - 1)]
@@ -0,0 +1,224 @@
+"""History of linkage checker runs in a sqlite database.
+
+Every run is a row in `runs`, every checked dataset a row in `results` and
+every linkage check criterion of a dataset a row in `criteria`. Both are
+indexed on dataset uuid, run and status, so questions across many runs (which
+datasets regressed, duration percentiles per service) do not need to parse
+the json output of every run.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from linkage_checker.constants import (
+    LINKAGE_CHECKER_URL,
+    RESULT_STORE_BATCH_SIZE,
+    RESULT_STORE_RETENTION_DAYS,
+)
+from linkage_checker.error import AppError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    linkage_checker_version TEXT,
+    linkage_checker_endpoint TEXT,
+    start_time_timestamp REAL NOT NULL,
+    end_time_timestamp REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    dataset_uuid TEXT NOT NULL,
+    dataset_title TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    endpoint_download_service TEXT,
+    endpoint_view_service TEXT,
+    endpoint_meta_data TEXT,
+    duration TEXT,
+    duration_seconds REAL,
+    evaluation_report_url TEXT
+);
+CREATE TABLE IF NOT EXISTS criteria (
+    result_id INTEGER NOT NULL REFERENCES results (id) ON DELETE CASCADE,
+    run_id INTEGER NOT NULL,
+    dataset_uuid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    passed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_start_time ON runs (start_time_timestamp);
+CREATE INDEX IF NOT EXISTS results_run_status ON results (run_id, status);
+CREATE INDEX IF NOT EXISTS results_dataset_run ON results (dataset_uuid, run_id);
+CREATE INDEX IF NOT EXISTS results_status ON results (status);
+CREATE INDEX IF NOT EXISTS criteria_result ON criteria (result_id);
+CREATE INDEX IF NOT EXISTS criteria_run_name ON criteria (run_id, name, passed);
+CREATE INDEX IF NOT EXISTS criteria_dataset_name ON criteria (dataset_uuid, name);
+"""
+
+RESULT_COLUMNS = (
+    "dataset_title",
+    "status",
+    "error",
+    "dataset_uuid",
+    "endpoint_download_service",
+    "endpoint_view_service",
+    "endpoint_meta_data",
+    "duration",
+    "evaluation_report_url",
+)
+
+# str(timedelta), e.g. "0:03:12.123456" or "1 day, 2:03:04"
+DURATION_PATTERN = re.compile(
+    r"^(?:(?P<days>-?\d+) days?, )?(?P<hours>\d+):(?P<minutes>\d+):(?P<seconds>\d+(?:\.\d+)?)$"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ResultStore:
+    """Writes results in batches of batch_size (and on flush/finish_run)."""
+
+    def __init__(self, path, batch_size=RESULT_STORE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(SCHEMA)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def start_run(self, start_time, linkage_checker_version):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (linkage_checker_version, linkage_checker_endpoint, start_time_timestamp) VALUES (?, ?, ?)",
+                (linkage_checker_version, LINKAGE_CHECKER_URL, start_time.timestamp()),
+            )
+        return cursor.lastrowid
+
+    def add_result(self, run_id, result):
+        with self._lock:
+            self._pending.append((run_id, result))
+            if len(self._pending) >= self.batch_size:
+                self.__flush()
+
+    def flush(self):
+        with self._lock:
+            self.__flush()
+
+    def finish_run(self, run_id, end_time):
+        with self._lock, self._connection:
+            self.__flush()
+            self._connection.execute(
+                "UPDATE runs SET end_time_timestamp = ? WHERE id = ?",
+                (end_time.timestamp(), run_id),
+            )
+
+    def prune(self, retention_days=RESULT_STORE_RETENTION_DAYS):
+        """Deletes the runs that started more than retention_days ago."""
+        oldest = time.time() - retention_days * 86400
+        with self._lock:
+            with self._connection:
+                deleted = self._connection.execute(
+                    "DELETE FROM runs WHERE start_time_timestamp < ?", (oldest,)
+                ).rowcount
+            if deleted:
+                # give the space of the deleted runs back to the file system
+                self._connection.execute("VACUUM")
+                logger.info(
+                    "deleted %d runs older than %d days from the result store",
+                    deleted,
+                    retention_days,
+                )
+
+    def load_run(self, run_id=None):
+        """Returns the run (the last one when run_id is None) in the json output format."""
+        with self._lock:
+            self.__flush()
+            if run_id is None:
+                run = self._connection.execute(
+                    "SELECT * FROM runs ORDER BY id DESC LIMIT 1"
+                ).fetchone()
+            else:
+                run = self._connection.execute(
+                    "SELECT * FROM runs WHERE id = ?", (run_id,)
+                ).fetchone()
+            if run is None:
+                raise AppError("run {} not found in {}".format(run_id, self.path))
+            run = dict(zip(("id", "version", "endpoint", "start", "end"), run))
+
+            results = []
+            result_rows = self._connection.execute(
+                "SELECT id, {} FROM results WHERE run_id = ? ORDER BY id".format(
+                    ", ".join(RESULT_COLUMNS)
+                ),
+                (run["id"],),
+            ).fetchall()
+            criteria = {}
+            for result_id, name, passed in self._connection.execute(
+                "SELECT result_id, name, passed FROM criteria WHERE run_id = ? ORDER BY rowid",
+                (run["id"],),
+            ):
+                criteria.setdefault(result_id, {})[name] = bool(passed)
+            for row in result_rows:
+                result = dict(zip(RESULT_COLUMNS, row[1:]))
+                if result["error"] is not None:
+                    result["error"] = json.loads(result["error"])
+                result["linkage_check_results"] = criteria.get(row[0])
+                results.append(result)
+
+        start_time = datetime.fromtimestamp(run["start"])
+        end_time = datetime.fromtimestamp(run["end"] or run["start"])
+        return run, start_time, end_time, results
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def __flush(self):
+        if not self._pending:
+            return
+        with self._connection:
+            for run_id, result in self._pending:
+                cursor = self._connection.execute(
+                    "INSERT INTO results (run_id, {}, duration_seconds) VALUES (?, {}, ?)".format(
+                        ", ".join(RESULT_COLUMNS), ", ".join("?" * len(RESULT_COLUMNS))
+                    ),
+                    (run_id,)
+                    + tuple(
+                        json.dumps(result.get(column))
+                        if column == "error" and result.get(column) is not None
+                        else result.get(column)
+                        for column in RESULT_COLUMNS
+                    )
+                    + (parse_duration(result.get("duration")),),
+                )
+                self._connection.executemany(
+                    "INSERT INTO criteria (result_id, run_id, dataset_uuid, name, passed) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (cursor.lastrowid, run_id, result["dataset_uuid"], name, passed)
+                        for name, passed in (
+                            result.get("linkage_check_results") or {}
+                        ).items()
+                    ],
+                )
+        self._pending = []
+
+
+def parse_duration(duration):
+    """Returns the number of seconds of a str(timedelta), None if it can't be parsed."""
+    if duration is None:
+        return None
+    match = DURATION_PATTERN.match(duration)
+    if match is None:
+        return None
+    return (
+        int(match.group("days") or 0) * 86400
+        + int(match.group("hours")) * 3600
+        + int(match.group("minutes")) * 60
+        + float(match.group("seconds"))
+    )
@@ -37,6 +37,9 @@ setup(
     install_requires=parse_pipfile(),
     tests_require=parse_pipfile(True),
     entry_points={
-        "console_scripts": ["linkage-checker = linkage_checker.cli:linkage_checker_command"]
+        "console_scripts": [
+            "linkage-checker = linkage_checker.cli:linkage_checker_command",
+            "linkage-checker-export-results = linkage_checker.cli:export_results_command",
+        ]
     },
 )
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Tests for grid.py, against a local stub of the selenium grid /status endpoint."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from linkage_checker.error import SessionError
+from linkage_checker.grid import GridScheduler, parse_grid_status
+
+
+def selenium_4_status(*nodes):
+    return {
+        "value": {
+            "ready": True,
+            "nodes": [
+                {
+                    "availability": availability,
+                    "slots": [{"session": {"sessionId": "1"}}] * busy
+                    + [{"session": None}] * free,
+                }
+                for availability, busy, free in nodes
+            ],
+        }
+    }
+
+
+@pytest.fixture
+def grid():
+    """Starts a stub grid, set grid.status to change its /status response."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/wd/hub/status" or server.status is None:
+                self.send_error(503)
+                return
+            body = json.dumps(server.status).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    server.status = selenium_4_status(("UP", 0, 2))
+    server.url = "http://127.0.0.1:{}/wd/hub".format(server.server_port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_grid_status():
+    assert parse_grid_status(selenium_4_status(("UP", 1, 2), ("DOWN", 0, 4))) == (3, 2)
+    assert parse_grid_status({"value": {"ready": True}}) == (1, 1)
+    assert parse_grid_status({"value": {"ready": False}}) == (1, 0)
+
+
+def test_sessions_are_only_handed_out_for_free_slots(grid):
+    scheduler = GridScheduler([grid.url], refresh_seconds=60, acquire_timeout=0)
+
+    assert scheduler.acquire() == grid.url
+    assert scheduler.acquire() == grid.url
+    with pytest.raises(SessionError):
+        scheduler.acquire()
+
+    scheduler.release(grid.url)
+    assert scheduler.acquire() == grid.url
+
+
+def test_sessions_are_spread_over_grids(grid):
+    other_grid = "http://127.0.0.1:1/wd/hub"
+    scheduler = GridScheduler([other_grid, grid.url], acquire_timeout=0)
+
+    with scheduler.session() as session:
+        assert session["url"] == grid.url
+    assert scheduler.capacity() == 2
+
+
+def test_unhealthy_grid_is_taken_out_of_rotation(grid):
+    scheduler = GridScheduler([grid.url], acquire_timeout=0)
+
+    with scheduler.session() as session:
+        session["failed"] = True
+
+    with pytest.raises(SessionError):
+        scheduler.acquire()
+
+
+def test_grid_without_available_nodes_is_not_used(grid):
+    grid.status = selenium_4_status(("DOWN", 0, 2))
+    scheduler = GridScheduler([grid.url], acquire_timeout=0)
+
+    with pytest.raises(SessionError):
+        scheduler.acquire()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Tests for http_cache.py"""
+
+import requests
+
+from linkage_checker.http_cache import HttpCache
+
+URL = "https://example.org/srv/dut/csw?request=GetRecordById&id=1"
+
+
+def make_response(status_code, content=b"", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeFetch:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, url, headers=None):
+        self.calls.append(headers)
+        return self.responses.pop(0)
+
+
+def test_fresh_response_is_served_from_cache(tmp_path):
+    fetch = FakeFetch(make_response(200, b"<xml/>", {"ETag": '"a"'}))
+    cache = HttpCache(tmp_path)
+
+    assert cache.get(URL, fetch=fetch).content == b"<xml/>"
+    assert cache.get(URL, fetch=fetch).content == b"<xml/>"
+    assert len(fetch.calls) == 1
+
+
+def test_expired_response_is_revalidated(tmp_path):
+    fetch = FakeFetch(
+        make_response(200, b"<xml/>", {"ETag": '"a"', "Last-Modified": "yesterday"}),
+        make_response(304),
+    )
+    cache = HttpCache(tmp_path, ttls=(), default_ttl=0)
+
+    cache.get(URL, fetch=fetch)
+    response = cache.get(URL, fetch=fetch)
+
+    assert response.status_code == 200
+    assert response.content == b"<xml/>"
+    assert fetch.calls[1]["If-None-Match"] == '"a"'
+    assert fetch.calls[1]["If-Modified-Since"] == "yesterday"
+    assert cache.revalidated == 1
+
+
+def test_index_survives_reopening(tmp_path):
+    fetch = FakeFetch(make_response(200, b"<xml/>"))
+    cache = HttpCache(tmp_path)
+    cache.get(URL, fetch=fetch)
+    cache.close()
+
+    assert HttpCache(tmp_path).get(URL, fetch=fetch).content == b"<xml/>"
+    assert len(fetch.calls) == 1
+
+
+def test_least_recently_used_response_is_evicted(tmp_path):
+    fetch = FakeFetch(
+        make_response(200, b"1234"),
+        make_response(200, b"5678"),
+        make_response(200, b"1234"),
+    )
+    cache = HttpCache(tmp_path, max_size_bytes=6)
+
+    cache.get(URL + "1", fetch=fetch)
+    cache.get(URL + "2", fetch=fetch)
+    cache.get(URL + "1", fetch=fetch)
+
+    assert len(fetch.calls) == 3
+
+
+def test_body_evicted_during_revalidation_is_still_served(tmp_path):
+    cache = HttpCache(tmp_path, ttls=(), default_ttl=0)
+    cache.get(URL, fetch=FakeFetch(make_response(200, b"<xml/>", {"ETag": '"a"'})))
+
+    def fetch(url, headers=None):
+        for body_path in tmp_path.glob("*.body"):
+            body_path.unlink()
+        return make_response(304)
+
+    assert cache.get(URL, fetch=fetch).content == b"<xml/>"
+    assert cache.get(URL, fetch=FakeFetch(make_response(200, b"<new/>"))).content == (
+        b"<new/>"
+    )
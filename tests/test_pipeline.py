@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tests for pipeline.py"""
+
+import _thread
+import threading
+
+import pytest
+
+from linkage_checker.pipeline import Pipeline
+
+
+def test_all_items_are_consumed():
+    consumed = []
+    lock = threading.Lock()
+
+    def consume(item):
+        with lock:
+            consumed.append(item)
+
+    Pipeline(lambda: iter(range(100)), consume, workers=4, queue_size=2).run()
+
+    assert sorted(consumed) == list(range(100))
+
+
+def test_queued_items_are_consumed_when_producer_fails():
+    consumed = []
+
+    def produce():
+        yield 1
+        yield 2
+        raise ValueError("harvest failed")
+
+    with pytest.raises(ValueError):
+        Pipeline(produce, consumed.append).run()
+
+    assert consumed == [1, 2]
+
+
+def test_pipeline_stops_when_consumer_fails():
+    produced = []
+
+    def produce():
+        for item in range(1000):
+            produced.append(item)
+            yield item
+
+    def consume(item):
+        raise ValueError("check failed")
+
+    with pytest.raises(ValueError):
+        Pipeline(produce, consume, queue_size=2).run()
+
+    assert len(produced) < 1000
+
+
+def test_interrupt_does_not_wait_for_busy_consumers():
+    release = threading.Event()
+    threading.Timer(0.2, _thread.interrupt_main).start()
+
+    with pytest.raises(KeyboardInterrupt):
+        Pipeline(lambda: iter(range(10)), lambda item: release.wait(), workers=2).run()
+
+    release.set()
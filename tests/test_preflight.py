@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tests for preflight.py"""
+
+from linkage_checker import preflight
+from linkage_checker.http_cache import build_response
+from linkage_checker.preflight import Preflight, get_probe_url
+
+
+def make_service(uuid, service_type, url):
+    return {
+        "uuid": uuid,
+        "title": uuid,
+        "service_type": service_type,
+        "service_access_point": url,
+        "coupled_datasets": [{"metadata_uuid": "1", "identifier": "id-1"}],
+        "quality_conformance_met": True,
+    }
+
+
+def make_dataset(view_url):
+    return {
+        "uuid": "1",
+        "title": "dataset",
+        "identifier": "id-1",
+        "view_service": make_service("view", "view", view_url),
+        "download_service": make_service(
+            "download", "download", "https://example.org/atom/index.xml"
+        ),
+    }
+
+
+def test_get_probe_url():
+    assert (
+        get_probe_url(make_service("1", "view", "https://example.org/wms?"))
+        == "https://example.org/wms?service=WMS&request=GetCapabilities"
+    )
+    assert (
+        get_probe_url(make_service("1", "download", "https://example.org/wfs"))
+        == "https://example.org/wfs?service=WFS&request=GetCapabilities"
+    )
+    assert (
+        get_probe_url(make_service("1", "download", "https://example.org/atom/a.xml"))
+        == "https://example.org/atom/a.xml"
+    )
+
+
+def test_problems(monkeypatch):
+    requested = []
+
+    def get(url):
+        requested.append(url)
+        if "broken" in url:
+            return build_response(url, 404, {}, b"")
+        return build_response(url, 200, {}, b"<Capabilities/>")
+
+    monkeypatch.setattr(preflight.http_client, "get", get)
+    checks = Preflight()
+
+    assert checks.problems(make_dataset("https://example.org/wms")) == []
+    assert checks.problems(make_dataset("https://example.org/wms")) == []
+    assert len(checks.problems(make_dataset("https://example.org/broken"))) == 1
+    assert len(requested) == 3
+    checks.close()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Tests for rate_control.py"""
+
+import requests
+
+from linkage_checker import rate_control
+from linkage_checker.rate_control import (
+    ConcurrencyController,
+    HostConcurrencyControllers,
+    get_with_retries,
+)
+
+
+def make_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+def test_limit_increases_while_healthy():
+    controller = ConcurrencyController("example.org", initial=2, maximum=4)
+
+    for _ in range(20):
+        in_flight = int(controller.limit)
+        for _ in range(in_flight):
+            controller.acquire()
+        for _ in range(in_flight):
+            controller.release(0.1)
+
+    assert controller.limit == 4
+
+
+def test_limit_decreases_when_overloaded():
+    controller = ConcurrencyController("example.org", initial=8, maximum=8)
+
+    controller.acquire()
+    controller.release(0.1, overloaded=True)
+
+    assert controller.limit == 4
+
+
+def test_limit_decreases_on_latency_spike():
+    controller = ConcurrencyController("example.org", initial=8, maximum=8)
+    controller.acquire()
+    controller.release(1)
+
+    controller.acquire()
+    controller.release(60)
+
+    assert controller.limit == 4
+
+
+def test_retries_after_server_error(monkeypatch):
+    monkeypatch.setattr(rate_control.time, "sleep", lambda seconds: None)
+    responses = [make_response(503), make_response(200)]
+
+    response = get_with_retries(
+        "https://example.org/",
+        HostConcurrencyControllers(),
+        fetch=lambda url: responses.pop(0),
+    )
+
+    assert response.status_code == 200
+    assert responses == []
+
+
+def test_retry_after_pauses_the_host():
+    controllers = HostConcurrencyControllers()
+    responses = [make_response(429, {"Retry-After": "0"}), make_response(200)]
+
+    response = get_with_retries(
+        "https://example.org/", controllers, fetch=lambda url: responses.pop(0)
+    )
+
+    assert response.status_code == 200
+    assert controllers.for_url("https://example.org/").overloaded == 1
+
+
+def test_latency_spikes_are_ignored_for_exempt_hosts():
+    controllers = HostConcurrencyControllers()
+    controller = controllers.for_url(
+        "https://inspire-geoportal.ec.europa.eu/linkagechecker.html"
+    )
+    limit = controller.limit
+
+    for latency in (60, 3600):
+        controller.acquire()
+        controller.release(latency)
+
+    assert controller.limit == limit
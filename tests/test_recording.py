@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Tests for recording.py"""
+
+import pytest
+
+from linkage_checker.error import AppError
+from linkage_checker.http_cache import build_response
+from linkage_checker.recording import Recorder, Replayer
+
+URL = "https://example.org/srv/api/records/1/related"
+
+
+def test_recorded_run_is_replayed(tmp_path):
+    archive_path = tmp_path / "run.zip"
+    recorder = Recorder(archive_path)
+    recorder.record_response(URL, build_response(URL, 200, {}, b"<first/>"))
+    recorder.record_response(URL, build_response(URL, 200, {}, b"<second/>"))
+    recorder.record_check("1", {"status": "PASSED"})
+    recorder.record_page_source("1", "<html/>")
+    recorder.close()
+
+    replayer = Replayer(archive_path)
+
+    assert replayer.response(URL).content == b"<first/>"
+    assert replayer.response(URL).content == b"<second/>"
+    assert replayer.response(URL).content == b"<second/>"
+    assert replayer.check_result("1") == {"status": "PASSED"}
+
+
+def test_missing_recording_is_an_error(tmp_path):
+    archive_path = tmp_path / "run.zip"
+    Recorder(archive_path).close()
+
+    with pytest.raises(AppError):
+        Replayer(archive_path).response(URL)
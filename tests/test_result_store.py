@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests for result_store.py"""
+
+from datetime import datetime, timedelta
+
+from linkage_checker.result_store import ResultStore, parse_duration
+
+RESULT = {
+    "dataset_title": "Adressen",
+    "status": "FAILED",
+    "error": None,
+    "dataset_uuid": "1",
+    "endpoint_download_service": "https://example.org/download",
+    "endpoint_view_service": "https://example.org/view",
+    "endpoint_meta_data": "https://example.org/1",
+    "duration": "0:02:03.500000",
+    "evaluation_report_url": "https://example.org/report",
+    "linkage_check_results": {"view_service_linkage": True, "download_service_linkage": False},
+}
+
+
+def test_run_is_loaded_in_output_format(tmp_path):
+    store = ResultStore(tmp_path / "results.db", batch_size=2)
+    start_time = datetime(2020, 1, 1, 12)
+    run_id = store.start_run(start_time, "0.3")
+    store.add_result(run_id, RESULT)
+    store.finish_run(run_id, start_time + timedelta(hours=1))
+
+    run, loaded_start_time, end_time, results = store.load_run()
+
+    assert run["id"] == run_id
+    assert loaded_start_time == start_time
+    assert end_time == start_time + timedelta(hours=1)
+    assert results == [RESULT]
+
+
+def test_old_runs_are_pruned(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    run_id = store.start_run(datetime.now() - timedelta(days=10), "0.3")
+    store.add_result(run_id, RESULT)
+    store.finish_run(run_id, datetime.now())
+
+    store.prune(retention_days=5)
+
+    assert store._connection.execute("SELECT COUNT(*) FROM results").fetchone() == (0,)
+
+
+def test_parse_duration():
+    assert parse_duration("0:02:03.500000") == 123.5
+    assert parse_duration("1 day, 1:00:00") == 90000
+    assert parse_duration(None) is None